@@ -3,14 +3,21 @@ Serves Dash app for viewing and filtering participant (meta)data for imaging and
 App accepts and parses a user-uploaded digest TSV file as input.
 """
 
+import json
+
 import dash_bootstrap_components as dbc
 import pandas as pd
-from dash import ALL, Dash, ctx, dcc, html
+from dash import ALL, Dash, ctx, html, no_update
 from dash.dependencies import Input, Output, State
 
 from . import plotting as plot
 from . import utility as util
-from .layout import DEFAULT_DATASET_NAME, construct_layout, upload_buttons
+from .layout import (
+    DEFAULT_DATASET_NAME,
+    construct_layout,
+    pipeline_status_dropdowns,
+    upload_buttons,
+)
 from .utility import PRIMARY_SESSION_COL
 
 EMPTY_FIGURE_PROPS = {"data": [], "layout": {}, "frames": []}
@@ -25,7 +32,43 @@ server = app.server
 app.layout = construct_layout()
 
 
-@app.callback(
+# Names of the available public datasets, by digest type and filename.
+# Needed to look up the dataset name in the browser when a public digest is loaded.
+PUBLIC_DIGEST_NAMES = {}
+for available_dataset in util.PUBLIC_DIGEST_FILE_PATHS.values():
+    for schema in util.BAGEL_CONFIG:
+        if schema in available_dataset:
+            PUBLIC_DIGEST_NAMES.setdefault(schema, {}).setdefault(
+                available_dataset[schema].name,
+                available_dataset.get("name", DEFAULT_DATASET_NAME),
+            )
+
+# Toggles a popup window for user to enter a dataset name when the data store changes.
+# This only depends on component values, so it runs in the browser to avoid a server roundtrip.
+app.clientside_callback(
+    f"""
+    function(parsedData, dialogSubmitClicks, dialogIsOpen, nameInputValue, wasUploadUsed, filename) {{
+        if (parsedData) {{
+            if (wasUploadUsed) {{
+                // If a non-empty name was entered in the modal, use it. Otherwise, use a default name.
+                if (nameInputValue) {{
+                    return [!dialogIsOpen, nameInputValue, null];
+                }}
+                return [!dialogIsOpen, {json.dumps(DEFAULT_DATASET_NAME)}, null];
+            }}
+
+            // If the user loaded a preset file, do not open the dataset name modal, and get the name of the dataset
+            // from the preset dataset names instead, based on the matching filename.
+            const publicDigestNames = {json.dumps(PUBLIC_DIGEST_NAMES)};
+            const datasetName = (publicDigestNames[parsedData.type] || {{}})[filename];
+            if (datasetName !== undefined) {{
+                return [false, datasetName, null];
+            }}
+        }}
+
+        return [dialogIsOpen, null, null];
+    }}
+    """,
     [
         Output("dataset-name-modal", "is_open"),
         Output("summary-title", "children"),
@@ -43,35 +86,6 @@ app.layout = construct_layout()
     ],
     prevent_initial_call=True,
 )
-def toggle_dataset_name_dialog(
-    parsed_data,
-    dialog_submit_clicks,
-    dialog_is_open,
-    name_input_value,
-    was_upload_used,
-    filename,
-):
-    """Toggles a popup window for user to enter a dataset name when the data store changes."""
-    if parsed_data is not None:
-        if was_upload_used:
-            # If a non-empty name was entered in the modal, use it. Otherwise, use a default name.
-            if name_input_value not in [None, ""]:
-                return not dialog_is_open, name_input_value, None
-            return not dialog_is_open, DEFAULT_DATASET_NAME, None
-
-        # If the user loaded a preset file, do not open the dataset name modal, and get the name of the dataset
-        # from the preset dataset dictionary instead, based on the matching filename.
-        for available_dataset in util.PUBLIC_DIGEST_FILE_PATHS.values():
-            relevant_digest_path = available_dataset.get(
-                parsed_data.get("type")
-            )
-            if relevant_digest_path.name == filename:
-                dataset_name = available_dataset.get(
-                    "name", DEFAULT_DATASET_NAME
-                )
-                return False, dataset_name, None
-
-    return dialog_is_open, None, None
 
 
 @app.callback(
@@ -100,8 +114,11 @@ def set_was_upload_used_flag(upload_contents, available_digest_nclicks):
         Output("memory-sessions", "data"),
         Output("memory-overview", "data"),
         Output("memory-pipelines", "data"),
+        Output("interactive-datatable", "columns"),
+        Output("memory-participant-fig", "data"),
         Output("upload-message", "children"),
         Output("interactive-datatable", "export_format"),
+        Output("memory-upload-hash", "data"),
     ],
     [
         Input(
@@ -113,9 +130,12 @@ def set_was_upload_used_flag(upload_contents, available_digest_nclicks):
         ),
     ],
     State({"type": "upload-data", "index": ALL, "btn_idx": ALL}, "filename"),
+    State("memory-upload-hash", "data"),
     prevent_initial_call=True,
 )
-def process_bagel(upload_contents, available_digest_nclicks, filenames):
+def process_bagel(
+    upload_contents, available_digest_nclicks, filenames, last_upload_hash
+):
     """
     From the contents of a correctly-formatted uploaded TSV file, parse and store (1) the pipeline overview data as a dataframe,
     and (2) pipeline-specific metadata as individual dataframes within a dict.
@@ -124,11 +144,20 @@ def process_bagel(upload_contents, available_digest_nclicks, filenames):
     bagel = None
     # Instead of raising errors in the console, store them in informative strings to be displayed in the UI
     upload_error = None
+    upload_hash = None
 
     # Get the schema type for the selected digest file ("imaging" or "phenotypic") from the ID of the triggered input component
     schema = ctx.triggered_id.index
     if ctx.triggered_id.type == "upload-data":
         filename = filenames[ctx.triggered_id.btn_idx]
+        # If the same file is re-uploaded (under the same name) for the same schema, leave all stored data
+        # (and hence the current filter selections, which are reset when a new file is stored) as is
+        upload_hash = util.get_upload_hash(
+            schema, filename, ctx.triggered[0]["value"]
+        )
+        if upload_hash == last_upload_hash:
+            return (no_update,) * len(ctx.outputs_list)
+
         bagel, upload_error = util.load_file_from_contents(
             filename=filename, contents=ctx.triggered[0]["value"]
         )
@@ -159,12 +188,29 @@ def process_bagel(upload_contents, available_digest_nclicks, filenames):
             # (before being converted to str) if there are NaNs in the column.
             # This should not be a problem after we disallow NaNs value in "participant_id" and "session_id" columns, https://github.com/neurobagel/digest/issues/20
             bagel[PRIMARY_SESSION_COL] = bagel[PRIMARY_SESSION_COL].astype(str)
-            session_list = bagel[PRIMARY_SESSION_COL].unique().tolist()
+            session_list = pd.unique(
+                bagel[PRIMARY_SESSION_COL].to_numpy()
+            ).tolist()
 
             overview_df = util.get_pipelines_overview(
                 bagel=bagel, schema=schema
             )
             pipelines_dict = util.extract_pipelines(bagel=bagel, schema=schema)
+
+            # The overview of participant statuses only depends on the uploaded file, so it is generated once here
+            # rather than each time the overview data store is read
+            participant_fig = (
+                plot.plot_pipeline_status_by_participants(
+                    overview_df, session_list
+                )
+                if schema != "phenotypic"
+                else None
+            )
+            overview_data = {
+                "type": schema,
+                "data_arrow": util.serialize_overview(overview_df),
+            }
+            datatable_columns = util.get_datatable_columns(overview_df)
     except Exception as exc:
         print(exc)  # for debugging
         upload_error = "Something went wrong while processing this file."
@@ -175,21 +221,28 @@ def process_bagel(upload_contents, available_digest_nclicks, filenames):
             None,
             None,
             None,
+            None,
+            None,
             f"Error: {upload_error}",
             "none",
+            None,
         )
 
-    # Change orientation of pipeline dataframe dictionary to enable storage as JSON data
+    # Change orientation of pipeline dataframe dictionary to enable storage as JSON data.
+    # Column-oriented lists avoid repeating every column name in each row of the stored JSON.
     for key in pipelines_dict:
-        pipelines_dict[key] = pipelines_dict[key].to_dict("records")
+        pipelines_dict[key] = pipelines_dict[key].to_dict("list")
 
     return (
         filename,
         session_list,
-        {"type": schema, "data": overview_df.to_dict("records")},
+        overview_data,
         pipelines_dict,
+        datatable_columns,
+        participant_fig,
         None,
         "csv",  # NOTE: the dash_table.DataTable object does not support "tsv" as an option for export_format
+        upload_hash,
     )
 
 
@@ -224,7 +277,7 @@ def display_dataset_metadata(parsed_data):
     if parsed_data is None:
         return None, {"display": "none"}, None
 
-    overview_df = pd.DataFrame.from_dict(parsed_data.get("data"))
+    overview_df = util.load_overview(parsed_data)
 
     return (
         util.construct_summary_str(overview_df),
@@ -281,7 +334,7 @@ def update_session_filter(parsed_data, session_list):
     if parsed_data is None:
         return [], {"display": "none"}
 
-    session_opts = [{"label": ses, "value": ses} for ses in session_list]
+    session_opts = util.get_session_options(tuple(session_list))
 
     return session_opts, {"display": "block"}
 
@@ -297,41 +350,17 @@ def create_pipeline_status_dropdowns(pipelines_dict, parsed_data):
     Generates a dropdown filter with status options for each unique pipeline in the input TSV,
     and disables the native datatable filter UI for the corresponding columns in the datatable.
     """
-    pipeline_dropdowns = []
-
     if pipelines_dict is None or parsed_data.get("type") == "phenotypic":
-        return pipeline_dropdowns
-
-    for pipeline in pipelines_dict:
-        new_pipeline_status_dropdown = dbc.Col(
-            [
-                dbc.Label(
-                    pipeline,
-                    className="mb-0",
-                ),
-                dcc.Dropdown(
-                    id={
-                        "type": "pipeline-status-dropdown",
-                        "index": pipeline,
-                    },
-                    options=list(util.PIPE_COMPLETE_STATUS_SHORT_DESC.keys()),
-                    placeholder="Filter by status...",
-                ),
-            ]
-        )
-        pipeline_dropdowns.append(new_pipeline_status_dropdown)
+        return []
 
-    return pipeline_dropdowns
+    return list(pipeline_status_dropdowns(tuple(pipelines_dict)))
 
 
 @app.callback(
-    [
-        Output("interactive-datatable", "columns"),
-        Output("interactive-datatable", "data"),
-    ],
+    Output("interactive-datatable", "data"),
     [
         Input("memory-overview", "data"),
-        Input("session-dropdown", "value"),
+        Input("memory-selected-sessions", "data"),
         Input("select-operator", "value"),
         Input({"type": "pipeline-status-dropdown", "index": ALL}, "value"),
         State("memory-pipelines", "data"),
@@ -345,35 +374,33 @@ def update_outputs(
     pipelines_dict,
 ):
     if parsed_data is None:
-        return None, None
-
-    data = pd.DataFrame.from_dict(parsed_data.get("data"))
+        return None
+
+    # The operator only has an effect when sessions are selected, so changing it alone does not change the data
+    if (
+        list(ctx.triggered_prop_ids) == ["select-operator.value"]
+        and not session_values
+    ):
+        return no_update
+
+    # NOTE: The order in which pipeline-specific dropdowns are added to the layout is determined by the
+    # order of pipelines in the pipeline-specific data store (see callback that generates the dropdowns).
+    # As a result, the dropdown values passed to a callback will also follow this same pipeline order.
+    data = util.load_filtered_overview(
+        parsed_data=parsed_data,
+        session_values=session_values,
+        operator_value=session_operator,
+        status_pipeline_names=tuple(pipelines_dict),
+        status_values=status_values,
+    )
 
-    if session_values or any(v is not None for v in status_values):
-        # NOTE: The order in which pipeline-specific dropdowns are added to the layout is determined by the
-        # order of pipelines in the pipeline-specific data store (see callback that generates the dropdowns).
-        # As a result, the dropdown values passed to a callback will also follow this same pipeline order.
-        pipeline_selected_filters = dict(
-            zip(pipelines_dict.keys(), status_values)
-        )
-        data = util.filter_records(
-            data=data,
-            session_values=session_values,
-            operator_value=session_operator,
-            status_values=pipeline_selected_filters,
-        )
-    tbl_columns = [
-        {
-            "name": i,
-            "id": i,
-            "hideable": True,
-            "type": util.type_column_for_dashtable(data[i]),
-        }
-        for i in data.columns
-    ]
-    tbl_data = data.to_dict("records")
+    # Identify each datatable row by its participant-session pair,
+    # so that callbacks can count visible rows from derived_virtual_row_ids instead of receiving the row data
+    tbl_data = util.get_datatable_records(
+        data.assign(**{util.ROW_ID_COL: util.get_row_ids(data)})
+    )
 
-    return tbl_columns, tbl_data
+    return tbl_data
 
 
 @app.callback(
@@ -383,10 +410,10 @@ def update_outputs(
     ],
     [
         Input("interactive-datatable", "columns"),
-        Input("interactive-datatable", "derived_virtual_data"),
+        Input("interactive-datatable", "derived_virtual_row_ids"),
     ],
 )
-def update_matching_rows(columns, virtual_data):
+def update_matching_rows(columns, virtual_row_ids):
     """
     If the visible data in the datatable changes, update counts of
     unique participants and records shown.
@@ -397,32 +424,66 @@ def update_matching_rows(columns, virtual_data):
     """
     # calculate participant count for active table as long as datatable columns exist
     if columns is not None and columns != []:
-        active_df = pd.DataFrame.from_dict(virtual_data)
+        virtual_row_ids = virtual_row_ids or []
         return (
-            f"Participants matching filter: {util.count_unique_subjects(active_df)}",
-            f"Records matching filter: {util.count_unique_records(active_df)}",
+            f"Participants matching filter: {util.count_unique_subjects_from_row_ids(virtual_row_ids)}",
+            f"Records matching filter: {util.count_unique_records_from_row_ids(virtual_row_ids)}",
         )
 
     return "", ""
 
 
-@app.callback(
+# Selecting several sessions in the dropdown fires one update per click, so only the last selection made within 250 ms
+# is passed on (via a data store) to the callback that filters the datatable.
+# Superseded selections resolve to no_update so that no callback is left pending.
+app.clientside_callback(
+    """
+    function(sessionValues, selectedSessions) {
+        const pending = window.sessionDropdownDebounce;
+        if (pending) {
+            clearTimeout(pending.timer);
+            pending.resolve(window.dash_clientside.no_update);
+            window.sessionDropdownDebounce = null;
+        }
+        if (JSON.stringify(sessionValues) === JSON.stringify(selectedSessions)) {
+            return window.dash_clientside.no_update;
+        }
+        return new Promise(function(resolve) {
+            const timer = setTimeout(function() {
+                window.sessionDropdownDebounce = null;
+                resolve(sessionValues);
+            }, 250);
+            window.sessionDropdownDebounce = {timer: timer, resolve: resolve};
+        });
+    }
+    """,
+    Output("memory-selected-sessions", "data"),
+    Input("session-dropdown", "value"),
+    State("memory-selected-sessions", "data"),
+    prevent_initial_call=True,
+)
+
+
+# If file contents change (i.e., selected new TSV for upload), reset displayed file name and selection values related to data filtering or plotting.
+# Reset will occur regardless of whether there is an issue processing the selected file.
+app.clientside_callback(
+    """
+    function(filename) {
+        return ["Input file: " + filename, "", "", "", null, false];
+    }
+    """,
     [
         Output("input-filename", "children"),
         Output("interactive-datatable", "filter_query"),
         Output("session-dropdown", "value"),
+        # Also set by the session dropdown debounce callback above
+        Output("memory-selected-sessions", "data", allow_duplicate=True),
         Output("phenotypic-column-plotting-dropdown", "value"),
         Output("session-toggle-switch", "value"),
     ],
     Input("memory-filename", "data"),
     prevent_initial_call=True,
 )
-def reset_selections(filename):
-    """
-    If file contents change (i.e., selected new TSV for upload), reset displayed file name and selection values related to data filtering or plotting.
-    Reset will occur regardless of whether there is an issue processing the selected file.
-    """
-    return f"Input file: {filename}", "", "", None, False
 
 
 @app.callback(
@@ -431,26 +492,19 @@ def reset_selections(filename):
         Output("fig-pipeline-status-all-ses", "style"),
         Output("processing-status-legend", "style"),
     ],
-    Input("memory-overview", "data"),
-    State("memory-sessions", "data"),
+    Input("memory-participant-fig", "data"),
     prevent_initial_call=True,
 )
-def generate_overview_status_fig_for_participants(parsed_data, session_list):
+def display_overview_status_fig_for_participants(participant_fig):
     """
-    When a new dataset is uploaded, generate stacked bar plots of pipeline statuses per session,
+    When a new dataset is uploaded, display the stacked bar plots of pipeline statuses per session,
     grouped in subplots corresponding to each pipeline.
 
     Provides overview of the number of participants with each status in a given session,
     per processing pipeline.
     """
-    if parsed_data is not None and parsed_data.get("type") != "phenotypic":
-        return (
-            plot.plot_pipeline_status_by_participants(
-                pd.DataFrame.from_dict(parsed_data.get("data")), session_list
-            ),
-            {"display": "block"},
-            {"display": "block"},
-        )
+    if participant_fig is not None:
+        return participant_fig, {"display": "block"}, {"display": "block"}
 
     return EMPTY_FIGURE_PROPS, {"display": "none"}, {"display": "none"}
 
@@ -460,36 +514,55 @@ def generate_overview_status_fig_for_participants(parsed_data, session_list):
         Output("fig-pipeline-status", "figure"),
         Output("fig-pipeline-status", "style"),
     ],
-    Input(
-        "interactive-datatable", "data"
-    ),  # Input not triggered by datatable frontend filtering
-    State("memory-pipelines", "data"),
-    State("memory-overview", "data"),
+    [
+        # Same inputs as the datatable data, so the figure is not triggered by datatable frontend filtering.
+        # The filtered overview is read from the server-side cache, rather than sending the datatable data
+        # back from the browser.
+        Input("memory-overview", "data"),
+        Input("memory-selected-sessions", "data"),
+        Input("select-operator", "value"),
+        Input({"type": "pipeline-status-dropdown", "index": ALL}, "value"),
+        State("memory-pipelines", "data"),
+    ],
     prevent_initial_call=True,
 )
-def update_overview_status_fig_for_records(data, pipelines_dict, parsed_data):
+def update_overview_status_fig_for_records(
+    parsed_data,
+    session_values,
+    session_operator,
+    status_values,
+    pipelines_dict,
+):
     """
     When visible data in the overview datatable is updated (excluding built-in frontend datatable filtering
     but including custom component filtering), generate stacked bar plot of pipeline statuses aggregated
     by pipeline. Counts of statuses in plot thus correspond to unique records (unique participant-session
     combinations).
     """
-    if data is None or parsed_data.get("type") == "phenotypic":
+    if parsed_data is None or parsed_data.get("type") == "phenotypic":
         return EMPTY_FIGURE_PROPS, {"display": "none"}
 
-    data_df = pd.DataFrame.from_dict(data)
+    # As for the datatable data, changing only the operator does not change the data
+    if (
+        list(ctx.triggered_prop_ids) == ["select-operator.value"]
+        and not session_values
+    ):
+        return no_update, no_update
+
+    data_df = util.load_filtered_overview(
+        parsed_data=parsed_data,
+        session_values=session_values,
+        operator_value=session_operator,
+        status_pipeline_names=tuple(pipelines_dict),
+        status_values=status_values,
+    )
 
     if not data_df.empty:
-        status_counts = (
-            plot.transform_active_data_to_long(data_df)
-            .groupby(["pipeline_name", "status"])
-            .size()
-            .reset_index(name="records")
-        )
+        status_counts = plot.count_records_by_pipeline_status(data_df)
     else:
         status_counts = plot.populate_empty_records_pipeline_status_plot(
             pipelines=pipelines_dict.keys(),
-            statuses=util.PIPE_COMPLETE_STATUS_SHORT_DESC.keys(),
+            statuses=util.PIPE_COMPLETE_STATUSES,
         )
 
     return plot.plot_pipeline_status_by_records(status_counts), {
@@ -511,7 +584,7 @@ def display_phenotypic_column_dropdown(parsed_data):
         return {"display": "none"}, []
 
     column_options = []
-    for column in pd.DataFrame.from_dict(parsed_data.get("data")):
+    for column in util.load_overview(parsed_data):
         # exclude unique participant identifier columns from visualization
         if column not in [
             "participant_id",
@@ -548,9 +621,13 @@ def plot_phenotypic_column(
     # If no data is visible in the datatable (i.e., zero matches), create an empty version of the dataframe (preserving the column names)
     # to supply to the plotting function. This ensures that an empty plot will be generated with the correct x-axis title.
     if not virtual_data:
-        data_to_plot = pd.DataFrame.from_dict(parsed_data.get("data")).iloc[
-            0:0
-        ]
+        # Categorical columns are cast back to object, since plotly cannot group an empty column by its unobserved categories
+        data_to_plot = util.load_overview(parsed_data).iloc[0:0]
+        data_to_plot = data_to_plot.astype(
+            dict.fromkeys(
+                data_to_plot.select_dtypes("category").columns, object
+            )
+        )
     else:
         data_to_plot = virtual_data
 
@@ -609,7 +686,10 @@ def generate_column_summary(
             {"display": "block"},
         )
 
-    column_data = pd.DataFrame.from_dict(virtual_data)[selected_column]
+    # Only the selected column is needed, so build it directly instead of a dataframe of all visible records
+    column_data = pd.Series(
+        [row[selected_column] for row in virtual_data], name=selected_column
+    )
     return (
         selected_column,
         column_datatype,
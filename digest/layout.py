@@ -2,6 +2,8 @@
 Defines layout and layout components for dashboard.
 """
 
+from functools import lru_cache
+
 import dash_bootstrap_components as dbc
 from dash import dash_table, dcc, html
 
@@ -467,6 +469,34 @@ def session_filter_form():
     )
 
 
+@lru_cache(maxsize=8)
+def pipeline_status_dropdowns(pipelines: tuple) -> tuple:
+    """
+    Generates a dropdown filter with status options for each of the given pipelines.
+
+    Cached by pipeline names so that re-uploading data with the same pipelines reuses the existing components.
+    """
+    return tuple(
+        dbc.Col(
+            [
+                dbc.Label(
+                    pipeline,
+                    className="mb-0",
+                ),
+                dcc.Dropdown(
+                    id={
+                        "type": "pipeline-status-dropdown",
+                        "index": pipeline,
+                    },
+                    options=util.PIPE_COMPLETE_STATUSES,
+                    placeholder="Filter by status...",
+                ),
+            ]
+        )
+        for pipeline in pipelines
+    )
+
+
 def phenotypic_plotting_form():
     """Generates the dropdown for selecting a phenotypic column to plot."""
     return html.Div(
@@ -535,9 +565,14 @@ def construct_layout():
             navbar(),
             dcc.Store(id="was-upload-used"),
             dcc.Store(id="memory-filename"),
+            # Hash of the last successfully processed upload (see app.py)
+            dcc.Store(id="memory-upload-hash"),
             dcc.Store(id="memory-sessions"),
             dcc.Store(id="memory-overview"),
             dcc.Store(id="memory-pipelines"),
+            dcc.Store(id="memory-participant-fig"),
+            # Debounced value of the session dropdown (see app.py)
+            dcc.Store(id="memory-selected-sessions"),
             dbc.Row(
                 children=[
                     dbc.Col(
@@ -42,6 +42,37 @@ def transform_active_data_to_long(data: pd.DataFrame) -> pd.DataFrame:
     )
 
 
+def count_records_by_pipeline_status(data: pd.DataFrame) -> pd.DataFrame:
+    """Returns dataframe of the number of records with each pipeline status, for each pipeline in the data."""
+    # Read statuses directly from the wide-format data instead of reshaping it to long format.
+    # Flattening the (record x pipeline) status matrix row by row gives pipeline codes that cycle through 0..n_pipelines-1.
+    pipelines = sorted(
+        col for col in data.columns if col not in util.get_id_columns(data)
+    )
+    status_codes, statuses = pd.factorize(
+        data[pipelines].to_numpy().ravel(), sort=True
+    )
+    pipeline_codes = np.tile(np.arange(len(pipelines)), len(data))
+
+    # Count each pipeline-status combination in one pass using a combined integer code.
+    # Missing statuses (code -1) are not counted.
+    is_counted = status_codes >= 0
+    counts = np.bincount(
+        pipeline_codes[is_counted] * len(statuses) + status_codes[is_counted],
+        minlength=len(pipelines) * len(statuses),
+    )
+    status_counts = pd.DataFrame(
+        {
+            "pipeline_name": np.repeat(pipelines, len(statuses)),
+            "status": np.tile(statuses, len(pipelines)),
+            "records": counts,
+        }
+    )
+
+    # Only keep combinations that occur in the data
+    return status_counts[status_counts["records"] > 0].reset_index(drop=True)
+
+
 def wrap_df_column_values(
     df: pd.DataFrame, column: str, width: int
 ) -> pd.DataFrame:
@@ -74,7 +105,7 @@ def plot_pipeline_status_by_participants(
         text_auto=True,
         facet_col="pipeline_name",
         category_orders={
-            "status": util.PIPE_COMPLETE_STATUS_SHORT_DESC.keys(),
+            "status": util.PIPE_COMPLETE_STATUSES,
             PRIMARY_SESSION_COL: session_list,
         },
         color_discrete_map=STATUS_COLORS,
@@ -101,7 +132,7 @@ def plot_pipeline_status_by_records(status_counts: pd.DataFrame) -> go.Figure:
         color="status",
         text_auto=True,
         category_orders={
-            "status": util.PIPE_COMPLETE_STATUS_SHORT_DESC.keys(),
+            "status": util.PIPE_COMPLETE_STATUSES,
             "pipeline_name": status_counts["pipeline_name"]
             .drop_duplicates()
             .sort_values(),
@@ -1,11 +1,28 @@
 import base64
+import hashlib
+import importlib.util
 import io
 import json
+import re
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Tuple, Union
+from types import MappingProxyType
+from typing import (
+    TYPE_CHECKING,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+if TYPE_CHECKING:
+    import polars as pl
 
 SCHEMAS_PATH = Path(__file__).absolute().parents[1] / "schemas"
 BAGEL_CONFIG = {
@@ -19,14 +36,49 @@ BAGEL_CONFIG = {
     },
 }
 # TODO: Update
-PIPE_COMPLETE_STATUS_SHORT_DESC = {
-    "SUCCESS": "All expected output files of pipeline are present.",
-    "FAIL": "At least one expected output of pipeline is missing.",
-    "INCOMPLETE": "Pipeline has not yet been run (output directory not available).",
-    "UNAVAILABLE": "Relevant MRI modality for pipeline not available.",
-}
+# Read-only, since this mapping is shared by all callbacks and layout components
+PIPE_COMPLETE_STATUS_SHORT_DESC = MappingProxyType(
+    {
+        "SUCCESS": "All expected output files of pipeline are present.",
+        "FAIL": "At least one expected output of pipeline is missing.",
+        "INCOMPLETE": "Pipeline has not yet been run (output directory not available).",
+        "UNAVAILABLE": "Relevant MRI modality for pipeline not available.",
+    }
+)
+PIPE_COMPLETE_STATUSES = tuple(PIPE_COMPLETE_STATUS_SHORT_DESC)
 # Column to use as the primary session identifier in the data
 PRIMARY_SESSION_COL = "session_id"
+# Separator between the participant and session IDs that make up a datatable row ID
+# (tabs are used since they cannot appear in unquoted values of the input TSV)
+ROW_ID_SEP = "\t"
+# Column holding the datatable row IDs (dash datatable requires row IDs to be in a column named "id")
+ROW_ID_COL = "id"
+# Lines skipped by pd.read_csv as blank (i.e., empty or containing only spaces), which Polars would read as rows of missing values
+BLANK_LINE_PATTERN = re.compile(rb"^ *\r?\n|^ +\Z", flags=re.MULTILINE)
+# Polars is an optional dependency which, if installed, is used for faster (multithreaded) reading of input files
+POLARS_AVAILABLE = importlib.util.find_spec("polars") is not None
+# Strings recognized as missing values when reading input files, matching the default NA values of pd.read_csv
+# (see https://pandas.pydata.org/docs/reference/api/pandas.read_csv.html)
+NA_VALUES = [
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "n/a",
+    "nan",
+    "null",
+]
 
 # TODO:
 # Could also use URLs for "imaging" or "phenotypic" locations if fetching from a remote repo doesn't slow things down too much.
@@ -56,7 +108,9 @@ def reset_column_dtypes(data: pd.DataFrame) -> pd.DataFrame:
     stream = io.StringIO()
     data.to_csv(stream, index=False)
     stream.seek(0)
-    data_retyped = pd.read_csv(stream)
+    # Infer each column's dtype from all of its values at once, since reading large data in chunks can
+    # otherwise produce columns mixing numbers and strings, which cannot be serialized for storage
+    data_retyped = pd.read_csv(stream, low_memory=False)
     stream.close()
 
     # Just in case, convert session labels back to strings (will avoid sessions being undesirably treated as continuous data in e.g., plots)
@@ -83,7 +137,40 @@ def type_column_for_dashtable(df_column: pd.Series) -> str:
     return "text"
 
 
-def construct_legend_str(status_desc: dict) -> str:
+def get_datatable_columns(data: pd.DataFrame) -> list:
+    """Returns the column definitions for displaying the given dataframe in a dash datatable."""
+    return [
+        {
+            "name": i,
+            "id": i,
+            "hideable": True,
+            "type": type_column_for_dashtable(data[i]),
+        }
+        for i in data.columns
+    ]
+
+
+def get_datatable_records(data: pd.DataFrame) -> list:
+    """
+    Returns the rows of a dataframe as a list of dicts for a dash datatable, equivalent to data.to_dict("records").
+
+    Converting each column with .tolist() first lets NumPy box all values of a column to Python objects at once,
+    which is much faster than the per-value conversion done by .to_dict("records").
+    """
+    columns = data.columns.tolist()
+    return [
+        dict(zip(columns, row))
+        for row in zip(*(data[col].tolist() for col in columns))
+    ]
+
+
+@lru_cache(maxsize=8)
+def get_session_options(sessions: tuple) -> list:
+    """Returns the options for a session dropdown, cached by the (ordered) session labels."""
+    return [{"label": ses, "value": ses} for ses in sessions]
+
+
+def construct_legend_str(status_desc: Mapping) -> str:
     """From a dictionary, constructs a legend-style string with multiple lines in the format of key: value."""
     return "\n".join(
         [f"{status}: {desc}" for status, desc in status_desc.items()]
@@ -205,14 +292,33 @@ def count_unique_subjects(data: pd.DataFrame) -> int:
 def count_unique_records(data: pd.DataFrame) -> int:
     """Returns number of unique participant-session pairs."""
     if set(["participant_id", PRIMARY_SESSION_COL]).issubset(data.columns):
-        return (
-            data[["participant_id", PRIMARY_SESSION_COL]]
-            .drop_duplicates()
-            .shape[0]
+        # Count repeated pairs, rather than building a deduplicated copy of the columns
+        is_repeated = data.duplicated(
+            subset=["participant_id", PRIMARY_SESSION_COL]
         )
+        return len(data) - int(is_repeated.sum())
     return 0
 
 
+def get_row_ids(data: pd.DataFrame) -> pd.Series:
+    """Returns an ID for each participant-session record, for use as datatable row IDs."""
+    return (
+        data["participant_id"].astype(str)
+        + ROW_ID_SEP
+        + data[PRIMARY_SESSION_COL].astype(str)
+    )
+
+
+def count_unique_subjects_from_row_ids(row_ids: list) -> int:
+    """Returns number of unique participants among the given datatable row IDs."""
+    return len({row_id.partition(ROW_ID_SEP)[0] for row_id in row_ids})
+
+
+def count_unique_records_from_row_ids(row_ids: list) -> int:
+    """Returns number of unique participant-session pairs among the given datatable row IDs."""
+    return len(set(row_ids))
+
+
 # TODO: Generalize function and variable names to include both assessments and pipelines
 def get_pipelines_overview(bagel: pd.DataFrame, schema: str) -> pd.DataFrame:
     """
@@ -259,6 +365,191 @@ def get_pipelines_overview(bagel: pd.DataFrame, schema: str) -> pd.DataFrame:
     return reset_column_dtypes(pipeline_complete_df)
 
 
+def serialize_overview(overview_df: pd.DataFrame) -> str:
+    """
+    Encodes the overview dataframe as base64 Arrow IPC bytes for storage in a dcc.Store.
+
+    Participant and session labels are stored as categoricals (in their order of appearance), so that the overview
+    read back from the store can be filtered by participant and session using integer category codes.
+    Other text columns with few distinct values (e.g., pipeline statuses) are also stored as categoricals,
+    which Arrow dictionary-encodes so that each distinct value is only stored once in the payload.
+    """
+    low_cardinality_cols = [
+        col
+        for col in overview_df.select_dtypes("object").columns
+        if pd.api.types.infer_dtype(overview_df[col], skipna=True) == "string"
+        and overview_df[col].nunique(dropna=False) < 0.5 * len(overview_df)
+    ]
+    overview_df = overview_df.astype(
+        dict.fromkeys(low_cardinality_cols, "category")
+    ).assign(
+        **{
+            col: pd.Categorical(
+                overview_df[col],
+                categories=overview_df[col].dropna().unique(),
+            )
+            for col in ["participant_id", PRIMARY_SESSION_COL]
+        }
+    )
+    return base64.b64encode(
+        pa.ipc.serialize_pandas(overview_df).to_pybytes()
+    ).decode()
+
+
+@lru_cache(maxsize=4)
+def _get_shared_payload(data_arrow: str) -> str:
+    # Each callback receives its own (equal) copy of the overview store payload.
+    # Returning the first copy seen for a payload means the caches keyed by payload below all share that one copy,
+    # rather than each cache entry keeping the (full-size) copy it was first called with.
+    return data_arrow
+
+
+@lru_cache(maxsize=4)
+def _decode_overview(data_arrow: str) -> pd.DataFrame:
+    return pa.ipc.deserialize_pandas(base64.b64decode(data_arrow))
+
+
+def load_overview(parsed_data: dict) -> pd.DataFrame:
+    """
+    Decodes the overview dataframe from the Arrow IPC payload of the overview data store.
+
+    Several callbacks fire on the same store update, so decoded dataframes are cached by payload.
+    A copy is returned so that callers cannot modify the cached dataframe.
+    """
+    return _decode_overview(
+        _get_shared_payload(parsed_data.get("data_arrow"))
+    ).copy()
+
+
+def _read_tsv_with_pyarrow(source: Union[Path, io.IOBase]) -> pd.DataFrame:
+    """
+    Reads a TSV file into a dataframe in a single multithreaded pass with pyarrow.
+
+    Parsing stops at the first row with more values than the header, which is reported in a ValueError.
+    pyarrow cannot pad rows with missing trailing values, so if any are found, the file is instead read with
+    the pandas C engine, which fills in the missing values with NaN.
+    """
+    invalid_rows = []
+
+    def handle_invalid_row(row: pa_csv.InvalidRow) -> str:
+        invalid_rows.append(row)
+        return "error" if row.actual_columns > row.expected_columns else "skip"
+
+    # Treat the same strings as missing values as pd.read_csv, including in text columns
+    null_options = {"null_values": NA_VALUES, "strings_can_be_null": True}
+    try:
+        table = pa_csv.read_csv(
+            source,
+            parse_options=pa_csv.ParseOptions(
+                delimiter="\t", invalid_row_handler=handle_invalid_row
+            ),
+            convert_options=pa_csv.ConvertOptions(**null_options),
+        )
+    except pa.ArrowInvalid as exc:
+        for row in invalid_rows:
+            if row.actual_columns > row.expected_columns:
+                raise ValueError(
+                    f"Found a row with more values ({row.actual_columns}) than columns in the header ({row.expected_columns}): {row.text!r}"
+                ) from exc
+        raise
+
+    # pyarrow reads text that is not valid UTF-8 as raw bytes, which Polars and pandas instead reject
+    binary_cols = [
+        field.name for field in table.schema if pa.types.is_binary(field.type)
+    ]
+    if binary_cols:
+        raise ValueError(
+            f"Found text that is not valid UTF-8 in the column(s): {binary_cols}"
+        )
+
+    if invalid_rows:
+        if hasattr(source, "seek"):
+            source.seek(0)
+        return pd.read_csv(source, sep="\t")
+
+    # pyarrow infers dates and times (e.g., pipeline_starttime), which pandas and Polars read as text.
+    # Their original text cannot be recovered from the parsed values, so only these columns are read again as text.
+    temporal_cols = [
+        field.name
+        for field in table.schema
+        if pa.types.is_temporal(field.type)
+    ]
+    if temporal_cols:
+        if hasattr(source, "seek"):
+            source.seek(0)
+        text_table = pa_csv.read_csv(
+            source,
+            parse_options=pa_csv.ParseOptions(delimiter="\t"),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=temporal_cols,
+                column_types=dict.fromkeys(temporal_cols, pa.string()),
+                **null_options,
+            ),
+        )
+        for col in temporal_cols:
+            table = table.set_column(
+                table.schema.get_field_index(col), col, text_table[col]
+            )
+    return table.to_pandas()
+
+
+def _read_without_blank_lines(source: Union[Path, io.IOBase]) -> bytes:
+    """Returns the contents of a TSV file with the lines that pd.read_csv would skip as blank removed."""
+    content = (
+        source.read_bytes() if isinstance(source, Path) else source.read()
+    )
+    if BLANK_LINE_PATTERN.search(content) is None:
+        return content
+    return BLANK_LINE_PATTERN.sub(b"", content)
+
+
+def _parse_space_padded_numbers(data: "pl.DataFrame") -> "pl.DataFrame":
+    """
+    Converts text columns of a Polars dataframe whose values are all numbers once leading and trailing spaces are removed
+    (e.g., " 5") to numeric columns, which pd.read_csv does when inferring column types.
+    """
+    import polars as pl
+
+    for col in data.select(pl.col(pl.String)).columns:
+        stripped = data[col].str.strip_chars(" ")
+        if stripped.equals(data[col], null_equal=True):
+            continue
+        for dtype in (pl.Int64, pl.Float64):
+            try:
+                data = data.with_columns(stripped.cast(dtype).alias(col))
+                break
+            except pl.exceptions.InvalidOperationError:
+                pass
+    return data
+
+
+def read_tsv(source: Union[Path, io.IOBase]) -> pd.DataFrame:
+    """
+    Reads a TSV file into a dataframe, using Polars for parsing if it is installed and pyarrow otherwise.
+    Raises a ValueError if the file cannot be parsed (e.g., a row has more values than the header).
+    """
+    if POLARS_AVAILABLE:
+        import polars as pl
+
+        try:
+            # Infer column types from all rows (like pandas)
+            data = _parse_space_padded_numbers(
+                pl.read_csv(
+                    _read_without_blank_lines(source),
+                    separator="\t",
+                    infer_schema_length=None,
+                    null_values=NA_VALUES,
+                )
+            ).to_pandas()
+        except pl.exceptions.PolarsError as exc:
+            raise ValueError(str(exc).splitlines()[0]) from exc
+    else:
+        data = _read_tsv_with_pyarrow(source)
+    # Convert nulls in object columns from None to NaN, so that the resulting dataframe is the same
+    # regardless of the reader used
+    return data.fillna(np.nan)
+
+
 def load_file_from_path(
     file_path: Path,
 ) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
@@ -266,10 +557,60 @@ def load_file_from_path(
     if not file_path.exists():
         return None, "File not found."
 
-    bagel = pd.read_csv(file_path, sep="\t")
+    try:
+        bagel = read_tsv(file_path)
+    except ValueError as exc:
+        return (
+            None,
+            f"The selected TSV could not be read: {exc}. Please double check your input.",
+        )
     return bagel, None
 
 
+def get_upload_hash(
+    schema: str, filename: str, contents: str, chunk_size: int = 1 << 20
+) -> str:
+    """
+    Returns a hash identifying the name and contents of a file uploaded for the given schema.
+
+    The contents are hashed chunk by chunk, to avoid making full-size copies of large uploads.
+    """
+    # Null characters cannot appear in the schema or filename, so they separate the hashed values unambiguously
+    upload_hash = hashlib.blake2b(schema.encode(), digest_size=16)
+    upload_hash.update(b"\0")
+    upload_hash.update(filename.encode())
+    upload_hash.update(b"\0")
+    for start in range(0, len(contents), chunk_size):
+        end = start + chunk_size
+        upload_hash.update(contents[start:end].encode())
+    return upload_hash.hexdigest()
+
+
+def decode_base64_to_buffer(
+    content_string: str, chunk_size: int = 1 << 20
+) -> io.BytesIO:
+    """
+    Decodes a base64 string into an in-memory binary buffer, chunk by chunk.
+
+    Decoding the whole string at once first makes a full-size ASCII copy of it, so decoding in chunks
+    keeps the peak memory use of large uploads lower. The chunk size must be a multiple of 4,
+    so that each chunk is a complete group of base64 characters.
+    """
+    buffer = io.BytesIO()
+    for start in range(0, len(content_string), chunk_size):
+        end = start + chunk_size
+        buffer.write(base64.b64decode(content_string[start:end]))
+    buffer.seek(0)
+    return buffer
+
+
+@lru_cache(maxsize=4)
+def _read_tsv_contents(content_string: str) -> pd.DataFrame:
+    # Cached by the base64-encoded file contents, so that re-uploading the same file does not parse it again.
+    # Parse the decoded bytes directly, rather than first decoding them into an intermediate (full-size) str copy.
+    return read_tsv(decode_base64_to_buffer(content_string))
+
+
 def load_file_from_contents(
     filename: str, contents: str
 ) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
@@ -277,9 +618,15 @@ def load_file_from_contents(
     if not filename.endswith(".tsv"):
         return None, "Invalid file type. Please upload a .tsv file."
 
-    content_type, content_string = contents.split(",")
-    decoded = base64.b64decode(content_string)
-    bagel = pd.read_csv(io.StringIO(decoded.decode("utf-8")), sep="\t")
+    content_type, content_string = contents.split(",", 1)
+    try:
+        # Return a copy, since the loaded dataframe is modified during later processing
+        bagel = _read_tsv_contents(content_string).copy()
+    except ValueError as exc:
+        return (
+            None,
+            f"The selected TSV could not be read: {exc}. Please double check your input.",
+        )
     return bagel, None
 
 
@@ -314,6 +661,13 @@ def get_schema_validation_errors(
     ):
         # TODO: Switch to warning once alerts are implemented for errors?
         error_msg = f"The selected TSV contains duplicate entries in the combination of: {unique_value_id_columns}. Please double check your input."
+    elif (
+        isinstance(event_id_col := get_event_id_columns(bagel, schema), str)
+        and (bagel[event_id_col] == ROW_ID_COL).any()
+    ):
+        # Each event named by a single column becomes a column of the overview table,
+        # which must not overwrite the datatable row IDs
+        error_msg = f"The selected TSV contains the {event_id_col} '{ROW_ID_COL}', which is a reserved column name. Please rename it and try again."
 
     return error_msg
 
@@ -322,11 +676,13 @@ def filter_records(
     data: pd.DataFrame,
     session_values: list,
     operator_value: str,
-    status_values: dict,
+    status_pipeline_names: Sequence[str],
+    status_values: Sequence[Optional[str]],
 ) -> pd.DataFrame:
     """
     Returns dataframe filtered for data corresponding to the specified sessions
-    and pipeline statuses. The selected operator value only has effect when >=1 session
+    and pipeline statuses. Pipeline statuses are given as parallel sequences of pipeline names and
+    selected status values, where a status value of None means no filter for that pipeline. The selected operator value only has effect when >=1 session
     has been selected, and determines whether the filter should be applied at the subject level
     (all; all selected sessions should be present, with pipeline statuses of each matching the filter)
     or at the session level (any; any selected session with pipeline statuses matching the filter).
@@ -335,42 +691,104 @@ def filter_records(
     column-wise filtering UI, since the filtering syntax does not readily support
     intuitive queries for multiple specific values in a column, or multi-column queries.
     """
-    pipeline_queries = [
-        f"`{pipeline}` == {repr(status_value)}"
-        for pipeline, status_value in status_values.items()
+    selected_pipelines = [
+        pipeline
+        for pipeline, status_value in zip(status_pipeline_names, status_values)
+        if status_value is not None
+    ]
+    selected_statuses = [
+        status_value
+        for status_value in status_values
         if status_value is not None
     ]
+    # Records whose pipeline statuses match all of the selected status filters,
+    # compared across all filtered pipeline columns at once
+    status_matches = (
+        data[selected_pipelines].to_numpy()
+        == np.array(selected_statuses, dtype=object)
+    ).all(axis=1)
 
     if not session_values:
-        query = " and ".join(pipeline_queries)
-    elif operator_value == "AND":
-        matching_subs = []
-        for sub_id, sub in data.groupby("participant_id"):
-            if all(
-                session in sub[PRIMARY_SESSION_COL].unique()
-                for session in session_values
-            ):
-                if all(
-                    not sub.query(
-                        " and ".join(
-                            [f"{PRIMARY_SESSION_COL} == '{session}'"]
-                            + pipeline_queries
-                        )
-                    ).empty
-                    for session in session_values
-                ):
-                    matching_subs.append(sub_id)
-        query = f"participant_id in {matching_subs} and {PRIMARY_SESSION_COL} in {session_values}"
+        return data[status_matches]
+
+    selected_sessions = pd.Index(session_values).unique()
+    # Position of each record's session among the selected sessions (-1 if not selected)
+    sessions = data[PRIMARY_SESSION_COL]
+    if isinstance(sessions.dtype, pd.CategoricalDtype):
+        # Only look up the session categories, then map each record's category code
+        # (-1 for missing sessions, which indexes the appended -1) to its position
+        session_codes = np.append(
+            selected_sessions.get_indexer(sessions.cat.categories), -1
+        )[sessions.cat.codes.to_numpy()]
     else:
-        if operator_value == "OR":
-            query = " and ".join(
-                [f"{PRIMARY_SESSION_COL} in {session_values}"]
-                + pipeline_queries
-            )
+        session_codes = selected_sessions.get_indexer(sessions)
+    session_matches = session_codes >= 0
+
+    if operator_value == "AND":
+        subjects = data["participant_id"]
+        if isinstance(subjects.dtype, pd.CategoricalDtype):
+            subject_codes = subjects.cat.codes.to_numpy()
+            subject_ids = subjects.cat.categories
+        else:
+            subject_codes, subject_ids = pd.factorize(subjects)
+        record_matches = (
+            status_matches & session_matches & (subject_codes >= 0)
+        )
+        # Mark which of the selected sessions have a matching record for each subject.
+        # The extra last row is left unset so that records with a missing participant_id never match.
+        matched_sessions = np.zeros(
+            (len(subject_ids) + 1, len(selected_sessions)), dtype=bool
+        )
+        matched_sessions[
+            subject_codes[record_matches], session_codes[record_matches]
+        ] = True
+        subject_matches = matched_sessions.all(axis=1)[subject_codes]
+        return data[subject_matches & session_matches]
+
+    return data[status_matches & session_matches]
+
+
+@lru_cache(maxsize=16)
+def _filter_overview(
+    data_arrow: str,
+    session_values: tuple,
+    operator_value: Optional[str],
+    status_pipeline_names: tuple,
+    status_values: tuple,
+) -> pd.DataFrame:
+    return filter_records(
+        data=_decode_overview(data_arrow),
+        session_values=list(session_values),
+        operator_value=operator_value,
+        status_pipeline_names=status_pipeline_names,
+        status_values=status_values,
+    )
 
-    data = data.query(query)
 
-    return data
+def load_filtered_overview(
+    parsed_data: dict,
+    session_values: Optional[list],
+    operator_value: str,
+    status_pipeline_names: Sequence[str],
+    status_values: Sequence[Optional[str]],
+) -> pd.DataFrame:
+    """
+    Returns the overview dataframe from the overview data store, filtered for the specified sessions and pipeline statuses.
+
+    Filtered dataframes are cached by payload and filter selections, so re-selecting a previous filter does not rerun it.
+    Since the operator has no effect when no sessions are selected, it is ignored in that case to reuse the same cached result.
+    If no sessions or pipeline statuses are selected, the full overview dataframe is returned.
+    """
+    if not session_values and all(v is None for v in status_values):
+        return load_overview(parsed_data)
+
+    return _filter_overview(
+        _get_shared_payload(parsed_data.get("data_arrow")),
+        tuple(session_values or ()),
+        operator_value if session_values else None,
+        tuple(status_pipeline_names),
+        tuple(status_values),
+    ).copy()
 
 
 def generate_column_summary_str(column: pd.Series) -> str:
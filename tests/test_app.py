@@ -176,3 +176,22 @@ def test_004_phenotypic_col_selection_generates_visualization(
     assert (
         test_server.get_logs() == []
     ), "browser console should contain no error"
+
+
+def test_005_callback_outputs_are_unique():
+    """
+    Test that no two callbacks set the same output without allow_duplicate=True,
+    since dash-renderer does not run any callbacks of an app with duplicate outputs.
+    """
+    app = import_app("digest.app")
+    outputs = [
+        output
+        for callback in app._callback_list
+        for output in (
+            callback["output"][2:-2].split("...")
+            if callback["output"].startswith("..")
+            else [callback["output"]]
+        )
+    ]
+
+    assert len(outputs) == len(set(outputs))
@@ -1,3 +1,6 @@
+import base64
+import io
+
 import numpy as np
 import pandas as pd
 import pytest
@@ -21,6 +24,104 @@ def test_invalid_filetype_returns_informative_error(filename):
     assert "Invalid file type" in upload_error
 
 
+@pytest.mark.parametrize("chunk_size", [4, 8, 1 << 20])
+def test_decode_base64_to_buffer(chunk_size):
+    """Test that decoding a base64 string in chunks gives the same bytes as decoding it at once."""
+    content = b"participant_id\tsession_id\nsub-1\t1\nsub-2\t2\n"
+    content_string = base64.b64encode(content).decode()
+
+    assert (
+        util.decode_base64_to_buffer(content_string, chunk_size).read()
+        == content
+    )
+
+
+def test_get_upload_hash_depends_on_filename_contents_and_schema():
+    """
+    Test that get_upload_hash() only gives the same hash for the same file (name and contents) uploaded for the same schema,
+    regardless of the size of the chunks hashed.
+    """
+    filename = "imagingbagel.tsv"
+    contents = "data:text/tab-separated-values;base64,cGFydGljaXBhbnRfaWQK"
+    upload_hash = util.get_upload_hash("imaging", filename, contents)
+
+    assert upload_hash == util.get_upload_hash(
+        "imaging", filename, contents, chunk_size=4
+    )
+    assert upload_hash != util.get_upload_hash(
+        "phenotypic", filename, contents
+    )
+    assert upload_hash != util.get_upload_hash(
+        "imaging", "imagingbagel.txt", contents
+    )
+    assert upload_hash != util.get_upload_hash(
+        "imaging", filename, contents + "Cg=="
+    )
+
+
+@pytest.fixture(
+    params=[False, True] if util.POLARS_AVAILABLE else [False],
+    ids=lambda use_polars: "polars" if use_polars else "pyarrow",
+)
+def tsv_reader(request, monkeypatch):
+    """Runs a test with each available TSV reader."""
+    monkeypatch.setattr(util, "POLARS_AVAILABLE", request.param)
+    # Do not reuse uploads parsed by the other reader
+    util._read_tsv_contents.cache_clear()
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        b"participant_id\tstatus\tscore\nsub-1\t\t1\nsub-2\tNA\t2\nsub-3\tSUCCESS\tn/a\n",
+        # Row with a missing trailing value
+        b"participant_id\tstatus\tscore\nsub-1\tn/a\t1\nsub-2\tFAIL\n",
+        # Blank lines at the end of the file
+        b"participant_id\tstatus\tscore\nsub-1\tn/a\t1\nsub-2\tFAIL\t2\n\n\n",
+        # Blank (including whitespace-only) lines in the middle of the file
+        b"participant_id\tstatus\tscore\nsub-1\tn/a\t1\n\n  \nsub-2\tFAIL\t2\n",
+        # Numbers padded with spaces
+        b"participant_id\tstatus\tscore\nsub-1\tn/a\t 1\nsub-2\tFAIL\t2 \n",
+    ],
+)
+def test_read_tsv_matches_pandas_missing_values(content, tsv_reader):
+    """Test that read_tsv() reads missing values (including in text columns and missing trailing values) and blank lines like pd.read_csv()."""
+    assert util.read_tsv(io.BytesIO(content)).equals(
+        pd.read_csv(io.BytesIO(content), sep="\t")
+    )
+
+
+def test_read_tsv_keeps_dates_as_text(bagels_path, tsv_reader):
+    """Test that read_tsv() reads date-like columns as text, like pd.read_csv()."""
+    bagel_path = bagels_path / "example_imaging_diff-sessions.tsv"
+    bagel = util.read_tsv(bagel_path)
+
+    assert bagel["pipeline_starttime"].dtype == object
+    assert bagel.equals(pd.read_csv(bagel_path, sep="\t"))
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        # Row with more values than the header
+        b"participant_id\tsession_id\nsub-1\t1\nsub-2\t1\t2\n",
+        # Empty file
+        b"",
+        # Text that is not valid UTF-8 (latin-1 encoded)
+        "participant_id\tsession_id\tname\nsub-1\t1\tJosé\n".encode("latin-1"),
+    ],
+)
+def test_unreadable_file_returns_informative_error(content, tsv_reader):
+    bagel, upload_error = util.load_file_from_contents(
+        "imagingbagel.tsv",
+        "data:text/tab-separated-values;base64,"
+        + base64.b64encode(content).decode(),
+    )
+
+    assert bagel is None
+    assert "could not be read" in upload_error
+
+
 @pytest.mark.parametrize(
     "original_df,duplicates_df",
     [
@@ -267,6 +368,30 @@ def test_reset_column_dtypes():
     assert pheno_overview_df_retyped["moca_total_status"].dtype == "bool"
 
 
+def test_reset_column_dtypes_does_not_mix_types():
+    """
+    Test that reset_column_dtypes() infers a single type for each column of a large dataframe,
+    so that the result can still be serialized for storage.
+    """
+    n_rows = 300000
+    overview_df = pd.DataFrame(
+        {
+            "participant_id": "sub-1",
+            "session_id": 1,
+            "moca_total": ["21"] * (n_rows - 1) + ["unknown"],
+        }
+    )
+
+    overview_df_retyped = util.reset_column_dtypes(overview_df)
+
+    assert (
+        pd.api.types.infer_dtype(overview_df_retyped["moca_total"]) == "string"
+    )
+    assert util.load_overview(
+        {"data_arrow": util.serialize_overview(overview_df_retyped)}
+    ).shape == (n_rows, 3)
+
+
 def test_wrap_df_column_values():
     """Test that wrap_df_column_values() wraps values of a column which are longer than the specified length."""
     df = pd.DataFrame(
@@ -328,3 +453,165 @@ def test_load_file_from_path(bagels_path):
 
     assert data is not None and isinstance(data, pd.DataFrame)
     assert upload_error is None
+
+
+def test_overview_round_trips_through_arrow_store_payload(bagels_path):
+    """
+    Test that an overview dataframe is unchanged after being encoded for and decoded from the overview data store,
+    apart from the participant and session labels and low-cardinality text columns being stored as categoricals.
+    """
+    bagel = pd.read_csv(bagels_path / "example_phenotypic.tsv", sep="\t")
+    bagel[PRIMARY_SESSION_COL] = bagel[PRIMARY_SESSION_COL].astype(str)
+    overview_df = util.get_pipelines_overview(bagel=bagel, schema="phenotypic")
+
+    parsed_data = {
+        "type": "phenotypic",
+        "data_arrow": util.serialize_overview(overview_df),
+    }
+
+    loaded_overview_df = util.load_overview(parsed_data)
+
+    id_cols = ["participant_id", PRIMARY_SESSION_COL]
+    assert all(
+        isinstance(loaded_overview_df[col].dtype, pd.CategoricalDtype)
+        for col in id_cols
+    )
+    assert loaded_overview_df.astype(
+        dict.fromkeys(
+            loaded_overview_df.select_dtypes("category").columns, object
+        )
+    ).equals(overview_df)
+
+
+def test_event_named_like_row_id_column_returns_informative_error():
+    """Test that an assessment which would become an overview column named like the datatable row ID column is rejected."""
+    bagel = pd.DataFrame(
+        {
+            "participant_id": ["s1", "s2"],
+            "session_id": [1, 1],
+            "assessment_name": [util.ROW_ID_COL, util.ROW_ID_COL],
+            "assessment_score": [7, 9],
+        }
+    )
+
+    upload_error = util.get_schema_validation_errors(bagel, "phenotypic")
+
+    assert upload_error is not None
+    assert "reserved column name" in upload_error
+
+
+@pytest.mark.parametrize(
+    "session_values,operator_value,status_value,expected_records",
+    [
+        (
+            [],
+            "AND",
+            "SUCCESS",
+            [("sub-1", "1"), ("sub-2", "2"), ("sub-3", "3")],
+        ),
+        (
+            ["1", "2"],
+            "AND",
+            None,
+            [("sub-1", "1"), ("sub-1", "2"), ("sub-2", "1"), ("sub-2", "2")],
+        ),
+        (["1", "2"], "AND", "SUCCESS", []),
+        (["1"], "AND", "SUCCESS", [("sub-1", "1")]),
+        (
+            ["1", "2"],
+            "OR",
+            "SUCCESS",
+            [("sub-1", "1"), ("sub-2", "2")],
+        ),
+        (["3"], "OR", None, [("sub-3", "3")]),
+    ],
+)
+@pytest.mark.parametrize("id_dtype", ["object", "category"])
+def test_filter_records(
+    session_values,
+    operator_value,
+    status_value,
+    expected_records,
+    id_dtype,
+):
+    """Test that filter_records() returns the records matching the selected sessions, operator, and pipeline statuses."""
+    data = pd.DataFrame(
+        {
+            "participant_id": ["sub-1", "sub-1", "sub-2", "sub-2", "sub-3"],
+            "session_id": ["1", "2", "1", "2", "3"],
+            "fmriprep": ["SUCCESS", "FAIL", "FAIL", "SUCCESS", "SUCCESS"],
+        }
+    ).astype({"participant_id": id_dtype, "session_id": id_dtype})
+
+    filtered_data = util.filter_records(
+        data=data,
+        session_values=session_values,
+        operator_value=operator_value,
+        status_pipeline_names=["fmriprep"],
+        status_values=[status_value],
+    )
+
+    assert (
+        list(
+            filtered_data[["participant_id", "session_id"]].itertuples(
+                index=False, name=None
+            )
+        )
+        == expected_records
+    )
+
+
+def test_count_records_by_pipeline_status():
+    """Test that count_records_by_pipeline_status() returns the number of records with each observed status per pipeline."""
+    data = pd.DataFrame(
+        {
+            "participant_id": ["sub-1", "sub-1", "sub-2"],
+            "session_id": ["1", "2", "1"],
+            "freesurfer": ["FAIL", "SUCCESS", np.nan],
+            "fmriprep": ["SUCCESS", "SUCCESS", "INCOMPLETE"],
+        }
+    )
+
+    status_counts = plot.count_records_by_pipeline_status(data)
+
+    assert status_counts.to_dict("records") == [
+        {"pipeline_name": "fmriprep", "status": "INCOMPLETE", "records": 1},
+        {"pipeline_name": "fmriprep", "status": "SUCCESS", "records": 2},
+        {"pipeline_name": "freesurfer", "status": "FAIL", "records": 1},
+        {"pipeline_name": "freesurfer", "status": "SUCCESS", "records": 1},
+    ]
+
+
+def test_counts_from_row_ids_match_counts_from_dataframe(bagels_path):
+    """Test that participant and record counts computed from datatable row IDs match those computed from the overview dataframe."""
+    bagel = pd.read_csv(bagels_path / "example_imaging.tsv", sep="\t")
+    bagel[PRIMARY_SESSION_COL] = bagel[PRIMARY_SESSION_COL].astype(str)
+    overview_df = util.get_pipelines_overview(bagel=bagel, schema="imaging")
+
+    row_ids = util.get_row_ids(overview_df).tolist()
+
+    assert util.count_unique_subjects_from_row_ids(
+        row_ids
+    ) == util.count_unique_subjects(overview_df)
+    assert util.count_unique_records_from_row_ids(
+        row_ids
+    ) == util.count_unique_records(overview_df)
+
+
+def test_get_datatable_records():
+    """Test that get_datatable_records() returns the same records as DataFrame.to_dict("records"), with values as native Python types."""
+    data = pd.DataFrame(
+        {
+            "participant_id": ["sub-1", "sub-2"],
+            "session_id": ["1", "1"],
+            "moca_total": [21, 24],
+            "updrs_3_total": [30.5, 12.0],
+            "group": ["PD", None],
+        }
+    )
+
+    records = util.get_datatable_records(data)
+
+    assert records == data.to_dict("records")
+    assert type(records[0]["moca_total"]) is int
+    assert type(records[0]["updrs_3_total"]) is float